@@ -1,21 +1,165 @@
 """ Elastic Search foreign data wrapper """
 # pylint: disable=too-many-instance-attributes, import-error, unexpected-keyword-arg, broad-except, line-too-long
 
+from functools import lru_cache, partial
 import json
 import logging
 
 from elasticsearch import VERSION as ELASTICSEARCH_VERSION
 from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import SerializationError
+from elasticsearch.serializer import JSONSerializer
 
 from multicorn import ForeignDataWrapper
 from multicorn.utils import log_to_postgres as log2pg
 
 from ._es_query import _PG_TO_ES_AGG_FUNCS, _OPERATORS_SUPPORTED, quals_to_es
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_dumps(value):
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode("utf-8")
+        except TypeError:
+            # orjson can't encode some values which the json module decoded,
+            # such as lone surrogates or integers beyond 64 bits
+            pass
+    # Encode compactly like orjson, so the output of each is the same
+    encoded = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    try:
+        encoded.encode("utf-8")
+    except UnicodeEncodeError:
+        # Lone surrogates can't be passed to Postgres, so escape them
+        encoded = json.dumps(value, separators=(",", ":"))
+    return encoded
+
+
+class _Serializer(JSONSerializer):
+    """JSON serializer which uses orjson when it is available. Scroll pages
+    are the largest payloads that the wrapper handles, so this is where most
+    of the (de)serialization cost is paid."""
+
+    def loads(self, s):
+        if orjson is not None:
+            try:
+                return orjson.loads(s)
+            except (ValueError, TypeError):
+                # orjson rejects some valid json, such as lone surrogate escapes
+                pass
+        try:
+            return json.loads(s)
+        except (ValueError, TypeError) as exception:
+            raise SerializationError(s, exception) from exception
+
+    def dumps(self, data):
+        if isinstance(data, (str, bytes)):
+            return data
+        if orjson is not None:
+            try:
+                return orjson.dumps(
+                    data, default=self.default, option=orjson.OPT_NON_STR_KEYS
+                ).decode("utf-8")
+            except TypeError:
+                # orjson can't encode some values, such as integers beyond 64 bits
+                pass
+        # Encode compactly like orjson, so the output of each is the same
+        try:
+            return json.dumps(
+                data, default=self.default, ensure_ascii=False, separators=(",", ":")
+            )
+        except (ValueError, TypeError) as exception:
+            raise SerializationError(data, exception) from exception
+
+
+# Stands in for the composite aggregation after key in the serialized query.
+# Any occurrence of this within a qual value would have its quotes escaped.
+_AFTER_KEY_PLACEHOLDER = {"__after_key__": None}
+
+# Returned by a column handler when the column is absent from the document
+_MISSING = object()
+
+
+def _convert_rowid_column(row_data):
+    return row_data["_id"]
+
+
+def _convert_score_column(row_data):
+    return row_data["_score"]
+
+
+def _convert_query_column(_row_data):
+    return _MISSING
+
+
+def _convert_source_column(column, row_data):
+    value = row_data["_source"].get(column, _MISSING)
+    if isinstance(value, (list, dict)):
+        return _json_dumps(value)
+    return value
+
+
+@lru_cache(maxsize=16)
+def _get_client(host, port, auth, timeout, http_compress, options):
+    """Returns a client for the Elastic Search server.
+
+    Each foreign table creates a wrapper instance, so clients are shared
+    between the tables of a backend that use the same server. This allows
+    their pooled keep-alive connections to be reused across tables."""
+
+    options = dict(options)
+    options.setdefault("maxsize", 32)
+    if http_compress and ELASTICSEARCH_VERSION[0] >= 7:
+        # Search responses are json and compress well
+        options["http_compress"] = True
+    return Elasticsearch(
+        [{"host": host, "port": port}],
+        http_auth=auth,
+        timeout=timeout,
+        serializer=_Serializer(),
+        **options
+    )
+
+
+def _get_total_hits(response):
+    """Returns the exact number of documents matched by the search, or None
+    if Elastic Search has only provided a lower bound."""
+
+    total = response["hits"]["total"]
+    if isinstance(total, dict):
+        # Elastic Search 7 stops counting after 10,000 hits by default
+        if total.get("relation", "eq") != "eq":
+            return None
+        return total["value"]
+    return total
+
 
 class ElasticsearchFDW(ForeignDataWrapper):
     """ Elastic Search Foreign Data Wrapper """
 
+    # ForeignDataWrapper does not define __slots__, so instances still have a
+    # __dict__, but these attributes are stored in slots instead of it.
+    __slots__ = (
+        "index",
+        "doc_type",
+        "query_column",
+        "score_column",
+        "scroll_size",
+        "scroll_duration",
+        "_rowid_column",
+        "path",
+        "arguments",
+        "client",
+        "columns",
+        "json_columns",
+        "column_handlers",
+        "scroll_id",
+    )
+
     @property
     def rowid_column(self):
         """Returns a column name which will act as a rowid column for
@@ -59,8 +203,16 @@ class ElasticsearchFDW(ForeignDataWrapper):
         host = options.pop("host", "localhost")
         port = int(options.pop("port", "9200"))
         timeout = int(options.pop("timeout", "10"))
-        self.client = Elasticsearch(
-            [{"host": host, "port": port}], http_auth=auth, timeout=timeout, **options
+        http_compress = options.pop("http_compress", "true").lower()
+        if http_compress not in {"true", "false"}:
+            raise ValueError('http_compress must be "true" or "false"')
+        self.client = _get_client(
+            host,
+            port,
+            auth,
+            timeout,
+            http_compress == "true",
+            tuple(sorted(options.items())),
         )
 
         self.columns = columns
@@ -70,6 +222,8 @@ class ElasticsearchFDW(ForeignDataWrapper):
             if column.base_type_name.upper() in {"JSON", "JSONB"}
         }
 
+        self.column_handlers = self._get_column_handlers()
+
         self.scroll_id = None
 
     def get_rel_size(self, quals, columns):
@@ -125,6 +279,16 @@ class ElasticsearchFDW(ForeignDataWrapper):
 
             is_aggregation = aggs or group_clauses
 
+            if query and not is_aggregation:
+                # Only fetch the fields of the requested columns. Without any
+                # such columns the document source is not needed at all.
+                query["_source"] = [
+                    column
+                    for column in columns
+                    if column
+                    not in (self.rowid_column, self.score_column, self.query_column)
+                ] or False
+
             if query:
                 response = self.client.search(
                     size=self.scroll_size if not is_aggregation else 0,
@@ -146,13 +310,21 @@ class ElasticsearchFDW(ForeignDataWrapper):
                 )
                 return
 
+            total = _get_total_hits(response)
+            returned = 0
+            convert_row = self._convert_response_row
             while True:
                 self.scroll_id = response["_scroll_id"]
+                hits = response["hits"]["hits"]
 
-                for result in response["hits"]["hits"]:
-                    yield self._convert_response_row(result, columns, query_string)
+                for result in hits:
+                    yield convert_row(result, columns, query_string)
 
-                if len(response["hits"]["hits"]) < self.scroll_size:
+                # Stop without requesting the empty page after the last one
+                returned += len(hits)
+                if len(hits) < self.scroll_size or (
+                    total is not None and returned >= total
+                ):
                     return
                 response = self.client.scroll(
                     scroll_id=self.scroll_id, scroll=self.scroll_duration
@@ -186,6 +358,7 @@ class ElasticsearchFDW(ForeignDataWrapper):
         document_id = new_values[self.rowid_column]
         new_values.pop(self.rowid_column, None)
 
+        # The json module is used so that large integers are written exactly
         for key in self.json_columns.intersection(new_values.keys()):
             new_values[key] = json.loads(new_values[key])
 
@@ -211,6 +384,7 @@ class ElasticsearchFDW(ForeignDataWrapper):
 
         new_values.pop(self.rowid_column, None)
 
+        # The json module is used so that large integers are written exactly
         for key in self.json_columns.intersection(new_values.keys()):
             new_values[key] = json.loads(new_values[key])
 
@@ -278,42 +452,42 @@ class ElasticsearchFDW(ForeignDataWrapper):
         )
 
         if query_string:
-            query["query"]["bool"]["must"].append(
-                {"query_string": {"query": query_string}}
-            )
+            query_string_query = {"query_string": {"query": query_string}}
+            if "bool" in query["query"]:
+                query["query"]["bool"]["must"].append(query_string_query)
+            else:
+                # Without any other quals the query is a match_all
+                query["query"] = {"bool": {"must": [query_string_query]}}
 
         return query, query_string
 
+    def _get_column_handlers(self):
+        """Decide once per column how it is read from a hit, so that the
+        conversion of each row does not need to branch on the column name."""
+
+        handlers = {}
+        for column in self.columns:
+            if column == self.rowid_column:
+                handlers[column] = _convert_rowid_column
+            elif column == self.score_column:
+                handlers[column] = _convert_score_column
+            elif column == self.query_column:
+                # The query column is not stored, it is set from the quals
+                handlers[column] = _convert_query_column
+            else:
+                handlers[column] = partial(_convert_source_column, column)
+        return handlers
+
     def _convert_response_row(self, row_data, columns, query):
+        row = {}
+        for column in columns:
+            value = self.column_handlers[column](row_data)
+            if value is not _MISSING:
+                row[column] = value
         if query:
             # Postgres checks the query after too, so the query column needs to be present
-            return dict(
-                [
-                    (column, self._convert_response_column(column, row_data))
-                    for column in columns
-                    if column in row_data["_source"]
-                    or column == self.rowid_column
-                    or column == self.score_column
-                ]
-                + [(self.query_column, query)]
-            )
-        return {
-            column: self._convert_response_column(column, row_data)
-            for column in columns
-            if column in row_data["_source"]
-            or column == self.rowid_column
-            or column == self.score_column
-        }
-
-    def _convert_response_column(self, column, row_data):
-        if column == self.rowid_column:
-            return row_data["_id"]
-        if column == self.score_column:
-            return row_data["_score"]
-        value = row_data["_source"][column]
-        if isinstance(value, (list, dict)):
-            return json.dumps(value)
-        return value
+            row[self.query_column] = query
+        return row
 
     def _handle_aggregation_response(self, query, response, aggs, group_clauses):
         if group_clauses is None:
@@ -329,6 +503,7 @@ class ElasticsearchFDW(ForeignDataWrapper):
                 result[agg_name] = response["aggregations"][agg_name]["value"]
             yield result
         else:
+            body_parts = None
             while True:
                 for bucket in response["aggregations"]["group_buckets"]["buckets"]:
                     result = {}
@@ -352,8 +527,26 @@ class ElasticsearchFDW(ForeignDataWrapper):
                 if "after_key" not in response["aggregations"]["group_buckets"]:
                     break
 
-                query["aggs"]["group_buckets"]["composite"]["after"] = response[
-                    "aggregations"
-                ]["group_buckets"]["after_key"]
-
-                response = self.client.search(size=0, body=query, **self.arguments)
+                after_key = response["aggregations"]["group_buckets"]["after_key"]
+                dumps = self.client.transport.serializer.dumps
+
+                if body_parts is None:
+                    # Only the after key changes between pages, so serialize
+                    # the query once and keep the encoded parts either side
+                    # of the after key
+                    composite = query["aggs"]["group_buckets"]["composite"]
+                    composite["after"] = _AFTER_KEY_PLACEHOLDER
+                    body_parts = [
+                        part.encode("utf-8")
+                        for part in dumps(query).split(dumps(_AFTER_KEY_PLACEHOLDER), 1)
+                    ]
+
+                if len(body_parts) == 2:
+                    body = dumps(after_key).encode("utf-8").join(body_parts)
+                else:
+                    # The query was encoded differently to the placeholder, so
+                    # the after key has to be set on the query itself
+                    composite["after"] = after_key
+                    body = query
+
+                response = self.client.search(size=0, body=body, **self.arguments)
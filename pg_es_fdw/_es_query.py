@@ -24,101 +24,97 @@ _PG_TO_ES_AGG_FUNCS = {
 
 _OPERATORS_SUPPORTED = [">", ">=", "<", "<=", "=", "<>", "!=", "~~"]
 
+# LIKE pattern tokens and their ES wildcard equivalents
+_PG_TO_ES_PATTERN = {
+    "%": "*",
+    "_": "?",
+    "\\%": "%",
+    "\\_": "_",
+    "*": "\\*",
+    "?": "\\?",
+    "\\\\": "\\",
+}
+_PATTERN_RE = re.compile(r"\\\\|\\?%|\\?_|\*|\?")
+
 
 def _convert_pattern_match_to_es(expr):
-    def _pg_es_pattern_map(matchobj):
-        if matchobj.group(0) == "%":
-            return "*"
-        elif matchobj.group(0) == "_":
-            return "?"
-        elif matchobj.group(0) == "\%":
-            return "%"
-        elif matchobj.group(0) == "\_":
-            return "_"
-        elif matchobj.group(0) == "*":
-            return "\\*"
-        elif matchobj.group(0) == "?":
-            return "\\?"
-        elif matchobj.group(0) == "\\\\":
-            return "\\"
-
-    return re.sub(r'\\\\|\\?%|\\?_|\*|\?', _pg_es_pattern_map, fr"{expr}")
-
-
-def _base_qual_to_es(col, op, value, column_map=None):
-    if column_map:
-        col = column_map.get(col, col)
+    return _PATTERN_RE.sub(
+        lambda matchobj: _PG_TO_ES_PATTERN[matchobj.group(0)], str(expr)
+    )
+
 
-    if value is None:
-        if op == "=":
-            return {"bool": {"must_not": {"exists": {"field": col}}}}
-        if op in ["<>", "!="]:
-            return {"exists": {"field": col}}
-        # Weird comparison to a NULL
-        return {"match_all": {}}
+def _match_all_to_es(_col, _value):
+    return {"match_all": {}}
 
-    if op in _RANGE_OPS:
-        return {"range": {col: {_RANGE_OPS[op]: value}}}
 
-    if op == "=":
-        return {"term": {col: value}}
+# Builders for each operator, keyed by the operator
+_QUAL_BUILDERS = {
+    **{
+        op: lambda col, value, es_op=es_op: {"range": {col: {es_op: value}}}
+        for op, es_op in _RANGE_OPS.items()
+    },
+    "=": lambda col, value: {"term": {col: value}},
+    "<>": lambda col, value: {"bool": {"must_not": {"term": {col: value}}}},
+    "!=": lambda col, value: {"bool": {"must_not": {"term": {col: value}}}},
+    "~~": lambda col, value: {"wildcard": {col: _convert_pattern_match_to_es(value)}},
+}
 
-    if op in ["<>", "!="]:
-        return {"bool": {"must_not": {"term": {col: value}}}}
+# Builders for comparisons to NULL, any other comparison to NULL is weird
+_NULL_QUAL_BUILDERS = {
+    "=": lambda col, value: {"bool": {"must_not": {"exists": {"field": col}}}},
+    "<>": lambda col, value: {"exists": {"field": col}},
+    "!=": lambda col, value: {"exists": {"field": col}},
+}
 
-    if op == "~~":
-        return {"wildcard": {col: _convert_pattern_match_to_es(value)}}
 
+def _base_qual_to_es(col, op, value):
+    builders = _NULL_QUAL_BUILDERS if value is None else _QUAL_BUILDERS
     # For unknown operators, get everything
-    return {"match_all": {}}
+    return builders.get(op, _match_all_to_es)(col, value)
 
 
 def _qual_to_es(qual, column_map=None):
+    # Resolve the column once, rather than for every element of a list
+    col = qual.field_name
+    if column_map:
+        col = column_map.get(col, col)
+
     if qual.is_list_operator:
         if qual.list_any_or_all == ANY:
             # Convert col op ANY([a,b,c]) into (cop op a) OR (col op b)...
             return {
                 "bool": {
                     "should": [
-                        _base_qual_to_es(
-                            qual.field_name, qual.operator[0], v, column_map
-                        )
-                        for v in qual.value
+                        _base_qual_to_es(col, qual.operator[0], v) for v in qual.value
                     ]
                 }
             }
         # Convert col op ALL(ARRAY[a,b,c...]) into (cop op a) AND (col op b)...
         return {
             "bool": {
-                "must": [
-                    _base_qual_to_es(qual.field_name, qual.operator[0], v, column_map)
-                    for v in qual.value
-                ]
+                "must": [_base_qual_to_es(col, qual.operator[0], v) for v in qual.value]
             }
         }
     else:
-        return _base_qual_to_es(qual.field_name, qual.operator, qual.value, column_map)
+        return _base_qual_to_es(col, qual.operator, qual.value)
 
 
 def quals_to_es(
     quals, aggs=None, group_clauses=None, ignore_columns=None, column_map=None
 ):
     """Convert a list of Multicorn quals to an ElasticSearch query"""
-    ignore_columns = ignore_columns or []
+    ignore_columns = frozenset(ignore_columns or ())
 
-    query = {
-        "query": {
-            "bool": {
-                "must": [
-                    _qual_to_es(q, column_map)
-                    for q in quals
-                    if q.field_name not in ignore_columns
-                ]
-            }
-        }
-    }
+    must = [
+        _qual_to_es(q, column_map) for q in quals if q.field_name not in ignore_columns
+    ]
+    bool_query = {"bool": {"must": must}} if must else {"match_all": {}}
+
+    if aggs is None and group_clauses is None:
+        return {"query": bool_query}
 
     # Aggregation/grouping queries
+    aggs_query = None
     if aggs is not None:
         aggs_query = {
             agg_name: {
@@ -130,31 +126,19 @@ def quals_to_es(
             if agg_name != "count.*"
         }
 
-        if group_clauses is None:
-            if "count.*" in aggs:
-                # There is no particular COUNT(*) equivalent in ES, instead
-                # for plain aggregations (e.g. no grouping statements), we need
-                # to enable the track_total_hits option in order to get an
-                # accuate number of matched docs.
-                query["track_total_hits"] = True
-
-            query["aggs"] = aggs_query
-
-    if group_clauses is not None:
-        group_query = {
-            "group_buckets": {
-                "composite": {
-                    "sources": [
-                        {column: {"terms": {"field": column}}}
-                        for column in group_clauses
-                    ]
-                }
-            }
-        }
-
-        if aggs is not None:
-            group_query["group_buckets"]["aggregations"] = aggs_query
-
-        query["aggs"] = group_query
+    if group_clauses is None:
+        if "count.*" in aggs:
+            # There is no particular COUNT(*) equivalent in ES, instead
+            # for plain aggregations (e.g. no grouping statements), we need
+            # to enable the track_total_hits option in order to get an
+            # accuate number of matched docs.
+            return {"query": bool_query, "track_total_hits": True, "aggs": aggs_query}
+        return {"query": bool_query, "aggs": aggs_query}
+
+    sources = [{column: {"terms": {"field": column}}} for column in group_clauses]
+    if aggs_query is None:
+        group_buckets = {"composite": {"sources": sources}}
+    else:
+        group_buckets = {"composite": {"sources": sources}, "aggregations": aggs_query}
 
-    return query
+    return {"query": bool_query, "aggs": {"group_buckets": group_buckets}}
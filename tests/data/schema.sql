@@ -61,4 +61,53 @@ OPTIONS
     )
 ;
 
+CREATE FOREIGN TABLE articles_small_scroll_es
+    (
+        id BIGINT,
+        title TEXT,
+        body TEXT,
+        query TEXT,
+        score NUMERIC
+    )
+SERVER multicorn_es
+OPTIONS
+    (
+        host 'elasticsearch',
+        port '9200',
+        index 'article-index',
+        type 'article',
+        rowid_column 'id',
+        query_column 'query',
+        score_column 'score',
+        scroll_size '10',
+        timeout '20',
+        username 'elastic',
+        password 'changeme'
+    )
+;
+
+CREATE FOREIGN TABLE nested_articles_small_scroll_es
+    (
+        id BIGINT,
+        member_count INTEGER,
+        query TEXT,
+        score NUMERIC
+    )
+SERVER multicorn_es
+OPTIONS
+    (
+        host 'elasticsearch',
+        port '9200',
+        index 'nested-article-index',
+        type 'article',
+        rowid_column 'id',
+        query_column 'query',
+        score_column 'score',
+        scroll_size '10',
+        timeout '20',
+        username 'elastic',
+        password 'changeme'
+    )
+;
+
 \q
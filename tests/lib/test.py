@@ -43,6 +43,21 @@ def perform_tests(pg_version, es_version):
     ):
         success = False
 
+    show_status("Testing read of id and score...")
+    if not show_result(
+        pg_version, es_version, "read-id-score", run_sql_test("read-id-score.sql")
+    ):
+        success = False
+
+    show_status("Testing read of an exact multiple of scroll size...")
+    if not show_result(
+        pg_version,
+        es_version,
+        "read-scroll-multiple",
+        run_sql_test("read-scroll-multiple.sql"),
+    ):
+        success = False
+
     show_status("Testing query...")
     if not show_result(pg_version, es_version, "query", run_sql_test("query.sql")):
         success = False
@@ -55,6 +70,19 @@ def perform_tests(pg_version, es_version):
     if not show_result(pg_version, es_version, "query-array", run_sql_test("query-array.sql")):
         success = False
 
+    show_status("Testing query without other quals...")
+    if not show_result(pg_version, es_version, "query-only", run_sql_test("query-only.sql")):
+        success = False
+
+    show_status("Testing paginated group by...")
+    if not show_result(
+        pg_version,
+        es_version,
+        "group-by-pagination",
+        run_sql_test("group-by-pagination.sql"),
+    ):
+        success = False
+
     return success
 
 
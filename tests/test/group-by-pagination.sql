@@ -0,0 +1,13 @@
+SELECT
+    (count(*) = 57 AND sum(members) = 61)
+FROM
+    (
+        SELECT
+            member_count,
+            count(*) AS members
+        FROM
+            nested_articles_small_scroll_es
+        GROUP BY
+            member_count
+    ) AS grouped
+;
@@ -0,0 +1,7 @@
+SELECT
+    DISTINCT (body ILIKE '%chess%' AND score IS NOT NULL)
+FROM
+    articles_es
+WHERE
+    query = 'body:chess'
+;
@@ -0,0 +1,9 @@
+SELECT
+    DISTINCT (pg.id = es.id AND es.score IS NOT NULL)
+FROM
+    articles AS pg
+FULL OUTER JOIN
+    (SELECT id, score FROM articles_es) AS es
+ON
+    pg.id = es.id
+;